@@ -4,17 +4,24 @@ from . import samplers
 from .ldm.models.diffusion.ddpm import LatentDiffusion
 from .. import model_management
 from .. import sample
+from ..cli_args import args
 
 
+@torch.inference_mode()
 def common_ksampler(model, seed, steps, cfg, sampler_name, scheduler, positive, negative, latent, denoise=1.0, disable_noise=False, start_step=None, last_step=None, force_full_denoise=False):
     device = model_management.get_torch_device()
     latent_image = latent["samples"]
 
     if disable_noise:
-        noise = torch.zeros(latent_image.size(), dtype=latent_image.dtype, layout=latent_image.layout, device="cpu")
+        noise = torch.zeros(latent_image.size(), dtype=latent_image.dtype, layout=latent_image.layout, device=device)
     else:
+        # the initial noise for a given seed differs between the gpu and cpu generators (and between gpu models),
+        # --cpu-noise draws it from the cpu generator like older versions did
+        noise_device = device
+        if args.cpu_noise or device.type != "cuda":
+            noise_device = "cpu"
         batch_inds = latent["batch_index"] if "batch_index" in latent else None
-        noise = sample.prepare_noise(latent_image, seed, batch_inds)
+        noise = sample.prepare_noise(latent_image, seed, batch_inds, device=noise_device)
 
     noise_mask = None
     if "noise_mask" in latent:
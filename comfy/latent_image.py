@@ -7,7 +7,7 @@ from PIL import Image
 from torch import Tensor
 
 from .hazard.utils import common_upscale
-from .util import SDType, _check_divisible_by_8
+from .util import SDType, _check_divisible_by_8, _resolve_device, _to_device
 
 
 class UpscaleMethod(Enum):
@@ -21,6 +21,15 @@ class CropMethod(Enum):
     CENTER = "center"
 
 
+def _to_uint8(data: Tensor) -> Tensor:
+    """
+    Quantizes [0, 1] image data to uint8 on the tensor's own device, so only
+    the uint8 result has to be copied back to the host.  The result is made
+    contiguous in the same pass, so its numpy view needs no further copies.
+    """
+    return data.detach().clamp(0, 1).mul_(255).round_().to(torch.uint8, memory_format=torch.contiguous_format)
+
+
 class RGBImage(SDType):
     def __init__(self, data: Tensor, device: Union[str, torch.device] = "cpu"):
         self._data = data  # shape: (1, height, width, 3)
@@ -43,8 +52,7 @@ class RGBImage(SDType):
         return width, height
 
     def to_image(self) -> Image:
-        arr = self._data.detach().cpu().numpy().reshape(self._data.shape[1:])
-        arr = (np.clip(arr, 0, 1) * 255).round().astype("uint8")
+        arr = _to_uint8(self._data).squeeze(0).cpu().numpy()
         return Image.fromarray(arr)
 
     def to_array(self, clip=True) -> np.ndarray:
@@ -99,8 +107,7 @@ class GreyscaleImage(SDType):
         return width, height
 
     def to_image(self) -> Image:
-        arr = self._data.detach().cpu().numpy()
-        arr = (np.clip(arr, 0, 1) * 255).round().astype("uint8")
+        arr = _to_uint8(self._data).cpu().numpy()
         return Image.fromarray(arr)
 
     def to_array(self, clip=True) -> np.ndarray:
@@ -150,13 +157,12 @@ class LatentImage(SDType):
         """
         Modifies the object in-place.
         """
-        torch_device = torch.device(device)
-        if torch_device == self.device:
-            return self
+        torch_device = _resolve_device(device)
 
-        self._data = self._data.to(torch_device)
-        if self._noise_mask is not None:
-            self._noise_mask = self._noise_mask.to(torch_device)
+        if self._data.device != torch_device:
+            self._data = _to_device(self._data, torch_device)
+        if self._noise_mask is not None and self._noise_mask.device != torch_device:
+            self._noise_mask = _to_device(self._noise_mask, torch_device)
         self.device = torch_device
         return self
 
@@ -168,7 +174,7 @@ class LatentImage(SDType):
     def empty(cls, width: int, height: int, device: Union[str, torch.device] = "cpu"):
         # EmptyLatentImage
         width, height = _check_divisible_by_8(width, height)
-        img = torch.zeros([1, 4, height, width])
+        img = torch.zeros([1, 4, height, width], device=_resolve_device(device))
         return cls(img, device=device)
 
     @classmethod
@@ -185,8 +191,20 @@ class LatentImage(SDType):
 
         assert latent_to.size() == latent_from.size()
 
-        s = latent_to._data.clone()
         width, height = latent_from.size()
+        canvas_height, canvas_width = latent_to._data.shape[-2], latent_to._data.shape[-1]
+
+        feather_top = y != 0
+        feather_bottom = y + height < canvas_height
+        feather_left = x != 0
+        feather_right = x + width < canvas_width
+
+        if not (feather_top or feather_bottom or feather_left or feather_right):
+            # latent_from covers the whole canvas, nothing of latent_to survives
+            s = latent_from._data[:, :, :canvas_height, :canvas_width]
+            return LatentImage(s, latent_to._noise_mask, device=latent_to.device)
+
+        s = latent_to._data.clone()
 
         if feather == 0:
             s[:, :, y: y + height, x: x + width] = latent_from._data[
@@ -197,22 +215,21 @@ class LatentImage(SDType):
         s_from = latent_from._data[:, :, : height - y, : width - x]
         mask = torch.ones_like(s_from)
 
-        for t in range(feather):
-            c = (1.0 / feather) * (t + 1)
-            if y != 0:
-                mask[:, :, t: 1 + t, :] *= c
-            if y + height < height:
-                mask[:, :, height - 1 - t: height - t, :] *= c
-            if x != 0:
-                mask[:, :, :, t: 1 + t] *= c
-            if x + width < width:
-                mask[:, :, :, width - 1 - t: width - t] *= c
-
-        rev_mask = torch.ones_like(mask) - mask
-        s[:, :, y: y + height, x: x + width] = (
-                s_from[:, :, : height - y, : width - x] * mask
-                + s[:, :, y: y + height, x: x + width] * rev_mask
-        )
+        # Linear ramp from 1/feather up to 1, applied to each feathered edge in one op.
+        ramp = torch.arange(1, feather + 1, device=s.device, dtype=s.dtype) / feather
+        rows = min(feather, mask.shape[2])
+        cols = min(feather, mask.shape[3])
+        if feather_top:
+            mask[:, :, :rows, :] *= ramp[:rows].view(-1, 1)
+        if feather_bottom:
+            mask[:, :, -rows:, :] *= ramp[:rows].flip(0).view(-1, 1)
+        if feather_left:
+            mask[:, :, :, :cols] *= ramp[:cols]
+        if feather_right:
+            mask[:, :, :, -cols:] *= ramp[:cols].flip(0)
+
+        # s + (s_from - s) * mask, in place and without a reversed mask
+        s[:, :, y: y + height, x: x + width].lerp_(s_from, mask)
 
         return LatentImage(s, latent_to._noise_mask, device=latent_to.device)
 
@@ -227,7 +244,7 @@ class LatentImage(SDType):
         width, height = _check_divisible_by_8(width, height)
 
         img = common_upscale(
-            self._data.clone().detach(),
+            self._data.detach(),
             width,
             height,
             upscale_method.value,
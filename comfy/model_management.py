@@ -159,6 +159,13 @@ if args.force_fp32:
     print("Forcing FP32, if this improves things please report it.")
     FORCE_FP32 = True
 
+#the vae and unet are called over and over with the same shapes, so let cudnn benchmark and cache the fastest conv algorithms.
+#every new resolution pays for one round of benchmarking on its first call.
+torch.backends.cudnn.benchmark = True
+if not FORCE_FP32:
+    torch.backends.cuda.matmul.allow_tf32 = True
+    torch.backends.cudnn.allow_tf32 = True
+
 if lowvram_available:
     try:
         import accelerate
@@ -281,9 +288,7 @@ def load_controlnet_gpu(control_models):
         #don't load controlnets like this if low vram because they will be loaded right before running and unloaded right after
         return
 
-    models = []
-    for m in control_models:
-        models += m.get_models()
+    models = [x for m in control_models for x in m.get_models()]
 
     for m in current_gpu_controlnets:
         if m not in models:
@@ -402,6 +407,14 @@ def mps_mode():
     global cpu_state
     return cpu_state == CPUState.MPS
 
+def is_nvidia_16_series(device_name):
+    #FP32 is faster on those cards?
+    nvidia_16_series = ["1660", "1650", "1630", "T500", "T550", "T600"]
+    for x in nvidia_16_series:
+        if x in device_name:
+            return True
+    return False
+
 def should_use_fp16():
     global xpu_available
     global directml_enabled
@@ -422,11 +435,8 @@ def should_use_fp16():
     if props.major < 7:
         return False
 
-    #FP32 is faster on those cards?
-    nvidia_16_series = ["1660", "1650", "1630", "T500", "T550", "T600"]
-    for x in nvidia_16_series:
-        if x in props.name:
-            return False
+    if is_nvidia_16_series(props.name):
+        return False
 
     return True
 
@@ -1,22 +1,27 @@
 import torch
 from . import model_management
 from . import samplers
+from .util import _to_device
 import math
 import numpy as np
 
-def prepare_noise(latent_image, seed, noise_inds=None):
+def prepare_noise(latent_image, seed, noise_inds=None, device="cpu"):
     """
     creates random noise given a latent image and a seed.
     optional arg skip can be used to skip and discard x number of noise generations for a given seed
+    the noise is generated directly on device, so no host buffer or copy is needed when device is a gpu
     """
+    # seeds the global cpu and cuda generators too, the ancestral and sde samplers draw their extra noise from them
     generator = torch.manual_seed(seed)
+    if torch.device(device).type != "cpu":
+        generator = torch.Generator(device=device).manual_seed(seed)
     if noise_inds is None:
-        return torch.randn(latent_image.size(), dtype=latent_image.dtype, layout=latent_image.layout, generator=generator, device="cpu")
+        return torch.randn(latent_image.size(), dtype=latent_image.dtype, layout=latent_image.layout, generator=generator, device=device)
     
     unique_inds, inverse = np.unique(noise_inds, return_inverse=True)
     noises = []
     for i in range(unique_inds[-1]+1):
-        noise = torch.randn([1] + list(latent_image.size())[1:], dtype=latent_image.dtype, layout=latent_image.layout, generator=generator, device="cpu")
+        noise = torch.randn([1] + list(latent_image.size())[1:], dtype=latent_image.dtype, layout=latent_image.layout, generator=generator, device=device)
         if i in unique_inds:
             noises.append(noise)
     noises = [noises[i] for i in inverse]
@@ -25,22 +30,25 @@ def prepare_noise(latent_image, seed, noise_inds=None):
 
 def prepare_mask(noise_mask, shape, device):
     """ensures noise mask is of proper dimensions"""
-    noise_mask = torch.nn.functional.interpolate(noise_mask.reshape((-1, 1, noise_mask.shape[-2], noise_mask.shape[-1])), size=(shape[2], shape[3]), mode="bilinear")
-    noise_mask = noise_mask.round()
-    noise_mask = torch.cat([noise_mask] * shape[1], dim=1)
-    if noise_mask.shape[0] < shape[0]:
+    noise_mask = _to_device(noise_mask.reshape((-1, 1, noise_mask.shape[-2], noise_mask.shape[-1])), device)
+    noise_mask = torch.nn.functional.interpolate(noise_mask, size=(shape[2], shape[3]), mode="bilinear").round_()
+    # the samplers only read the mask, so broadcast with stride-0 views instead of copies
+    if noise_mask.shape[0] == 1:
+        noise_mask = noise_mask.expand(shape[0], -1, -1, -1)
+    elif noise_mask.shape[0] < shape[0]:
         noise_mask = noise_mask.repeat(math.ceil(shape[0] / noise_mask.shape[0]), 1, 1, 1)[:shape[0]]
-    noise_mask = noise_mask.to(device)
-    return noise_mask
+    return noise_mask.expand(-1, shape[1], -1, -1)
 
 def broadcast_cond(cond, batch, device):
     """broadcasts conditioning to the batch size"""
     copy = []
     for p in cond:
-        t = p[0]
-        if t.shape[0] < batch:
+        t = _to_device(p[0], device)
+        if t.shape[0] == 1:
+            # the samplers only read the conditioning, a stride-0 view is enough
+            t = t.expand(batch, *t.shape[1:])
+        elif t.shape[0] < batch:
             t = torch.cat([t] * batch)
-        t = t.to(device)
         copy += [[t] + p[1:]]
     return copy
 
@@ -56,7 +64,8 @@ def load_additional_models(positive, negative):
     control_nets = get_models_from_cond(positive, "control") + get_models_from_cond(negative, "control")
     gligen = get_models_from_cond(positive, "gligen") + get_models_from_cond(negative, "gligen")
     gligen = [x[1] for x in gligen]
-    models = control_nets + gligen
+    # the same model is often referenced from both positive and negative, only load and clean it up once
+    models = list({id(m): m for m in control_nets + gligen}.values())
     model_management.load_controlnet_gpu(models)
     return models
 
@@ -75,8 +84,8 @@ def sample(model, noise, steps, cfg, sampler_name, scheduler, positive, negative
     model_management.load_model_gpu(model)
     real_model = model.model
 
-    noise = noise.to(device)
-    latent_image = latent_image.to(device)
+    noise = _to_device(noise, device)
+    latent_image = _to_device(latent_image, device)
 
     positive_copy = broadcast_cond(positive, noise.shape[0], device)
     negative_copy = broadcast_cond(negative, noise.shape[0], device)
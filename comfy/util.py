@@ -19,6 +19,27 @@ def _check_divisible_by_n(n: int, *vals: int) -> Iterable[int]:
     return (v // n for v in vals)
 
 
+def _resolve_device(device: Union[str, torch.device]) -> torch.device:
+    """
+    Resolves "cuda" to the current cuda device, so that equality checks
+    against tensor.device (which always has an index) work.
+    """
+    torch_device = torch.device(device)
+    if torch_device.type == "cuda" and torch_device.index is None:
+        torch_device = torch.device("cuda", torch.cuda.current_device())
+    return torch_device
+
+
+def _to_device(tensor: torch.Tensor, device: torch.device) -> torch.Tensor:
+    """
+    Like tensor.to(device), but host to cuda copies go through pinned memory
+    and don't block the host.
+    """
+    if device.type == "cuda" and tensor.device.type == "cpu":
+        return tensor.pin_memory().to(device, non_blocking=True)
+    return tensor.to(device)
+
+
 class SDType:
     device: Optional[torch.device] = None
 
@@ -1,31 +1,105 @@
-from typing import Union
+import contextlib
+from typing import Dict, Union
 
 import torch
 from torch import Tensor
 
+from . import model_management
 from .hazard.sd import VAE
 from .latent_image import GreyscaleImage, LatentImage, RGBImage
-from .util import SDType, _check_divisible_by_64, _check_divisible_by_8
+from .util import SDType, _check_divisible_by_64, _check_divisible_by_8, _resolve_device
+
+
+def _cuda_dtype(device: torch.device) -> torch.dtype:
+    """
+    The dtype to run the VAE in on the given cuda device.  bf16 has the range
+    to avoid the overflows fp16 sometimes hits in the VAE, so it's preferred
+    on cards with native support for it (Ampere and newer); older cards only
+    emulate it.  Cards before Volta and the 16 series are slow in fp16 too, so
+    they stay fp32.
+    """
+    if not model_management.should_use_fp16():
+        return torch.float32
+    props = torch.cuda.get_device_properties(device)
+    if props.major >= 8:
+        return torch.bfloat16
+    if props.major >= 7 and not model_management.is_nvidia_16_series(props.name):
+        return torch.float16
+    return torch.float32
+
+
+def _full_precision_output(conv: torch.nn.Conv2d) -> None:
+    """
+    Makes the decoder's output projection run in its weights' dtype (fp32)
+    under cuda autocast.  A half precision output visibly changes the final
+    pixel values, and the VAE's post-processing follows the conv's dtype.
+    Overrides forward on the instance, so the state dict is unchanged.
+    """
+    def forward(x: Tensor) -> Tensor:
+        if x.device.type != "cuda":
+            return type(conv).forward(conv, x)
+        with torch.autocast(device_type="cuda", enabled=False):
+            return type(conv).forward(conv, x.to(conv.weight.dtype))
+
+    conv.forward = forward
 
 
 class VAEModel(SDType):
     def __init__(self, model: VAE, device: Union[str, torch.device] = "cpu"):
         self._model = model
+        _full_precision_output(self._model.first_stage_model.decoder.conv_out)
+        self._pinned_buffers: Dict[str, Tensor] = {}
+        self.dtype = torch.float32
+        self._erosion_kernel = torch.ones((1, 1, 6, 6))
         self.to(device)
 
     def to(self, device: Union[str, torch.device]) -> "VAEModel":
         """
         Modifies the object in-place.
         """
-        torch_device = torch.device(device)
+        torch_device = _resolve_device(device)
         if torch_device == self.device:
             return self
 
-        self._model.first_stage_model.to(torch_device)
+        # The weights stay fp32, half precision only comes from autocast in
+        # encode/decode, so nothing is lost when moving back off cuda.
+        self.dtype = _cuda_dtype(torch_device) if torch_device.type == "cuda" else torch.float32
+        # The conv stacks run faster in NHWC.  Module.to(device) preserves the
+        # memory format, so this survives the VAE moving itself on and off the
+        # device during encode/decode.
+        self._model.first_stage_model.to(torch_device, memory_format=torch.channels_last)
+        self._erosion_kernel = self._erosion_kernel.to(torch_device)
         self._model.device = torch_device
         self.device = torch_device
+        if torch_device.type != "cuda":
+            self._pinned_buffers.clear()
         return self
 
+    def _upload(self, name: str, tensor: Tensor) -> Tensor:
+        """
+        Copies an input tensor to this model's device.  Host to cuda copies are
+        staged through a pinned buffer that is kept around and reused for the
+        next input of the same shape.
+        """
+        if self.device.type != "cuda" or tensor.device.type != "cpu":
+            return tensor.to(self.device)
+
+        buffer = self._pinned_buffers.get(name)
+        if buffer is None or buffer.shape != tensor.shape or buffer.dtype != tensor.dtype:
+            buffer = torch.empty_like(tensor, pin_memory=True)
+            self._pinned_buffers[name] = buffer
+        # The previous upload from this buffer has finished by now, since the
+        # result of every encode is copied back to the host before returning.
+        buffer.copy_(tensor)
+        return buffer.to(self.device, non_blocking=True)
+
+    def _autocast(self):
+        # Only build an autocast context when it's used, some backends (directml,
+        # mps on older torch) reject it even when disabled.
+        if self.dtype == torch.float32:
+            return contextlib.nullcontext()
+        return torch.autocast(device_type=self.device.type, dtype=self.dtype)
+
     @classmethod
     def from_model(
         cls, model_filepath: str, device: Union[str, torch.device] = "cpu"
@@ -33,44 +107,51 @@ class VAEModel(SDType):
         # VAELoader
         return VAEModel(VAE(ckpt_path=model_filepath), device=device)
 
+    @torch.inference_mode()
     def encode(self, image: RGBImage) -> LatentImage:
         # VAEEncode
         # XXX something's wrong here, I think
         _check_divisible_by_64(*image.size())
-        img = self._model.encode(image.to_tensor().to(self.device))
+        # Images are stored as NHWC, so the VAE's movedim to NCHW already
+        # yields a channels_last view.
+        with self._autocast():
+            img = self._model.encode(self._upload("image", image.to_tensor()))
         return LatentImage(img, device=self.device)
 
+    @torch.inference_mode()
     def masked_encode(self, image: RGBImage, mask: GreyscaleImage) -> LatentImage:
         # VAEEncodeForInpaint
 
-        image_t = image.to_tensor().clone()
-        mask_t = mask.to_tensor()
-
         assert image.size() == mask.size()
         _check_divisible_by_64(*image.size())
 
-        kernel_tensor = torch.ones((1, 1, 6, 6)).to(self.device)
+        image_t = self._upload("image", image.to_tensor())
+        mask_t = self._upload("mask", mask.to_tensor())
 
-        mask_erosion = torch.clamp(
-            torch.nn.functional.conv2d((mask_t.round()[None, None]), kernel_tensor, padding=3),
-            0, 1)
+        # mask_t may be the caller's tensor, so round into a new one, but only once
+        mask_round = mask_t.round()
+        mask_erosion = torch.nn.functional.conv2d(
+            mask_round[None, None], self._erosion_kernel, padding=3
+        ).clamp_(0, 1)
 
-        m = 1.0-mask_t.round()
+        m = 1.0-mask_round
 
-        for i in range(3):
-            image_t[:, :, :, i] -= 0.5
-            image_t[:, :, :, i] *= m
-            image_t[:, :, :, i] += 0.5
+        # Grey out the masked pixels; out of place, so the input image is untouched.
+        image_t = (image_t - 0.5) * m[:, :, None] + 0.5
 
-        img = self._model.encode(image_t)
-        return LatentImage(img, mask=mask_erosion[0].round(), device=self.device)
+        with self._autocast():
+            img = self._model.encode(image_t)
+        return LatentImage(img, mask=mask_erosion[0].round_(), device=self.device)
 
+    @torch.inference_mode()
     def decode(self, latent_image: LatentImage) -> RGBImage:
         # VAEDecode
 
-        img: Tensor = self._model.decode(
-            latent_image.to_internal_representation()["samples"]
-        )
+        samples = latent_image.to_internal_representation()["samples"]
+        with self._autocast():
+            img: Tensor = self._model.decode(
+                samples.contiguous(memory_format=torch.channels_last)
+            )
         if img.shape[0] != 1:
             raise RuntimeError(
                 f"Expected the output of vae.decode to have shape[0]==1.  shape={img.shape}"
@@ -58,6 +58,25 @@ class TestImageConversions(TestCase):
         self.assertTrue(np.all(r1 == r2))
 
 
+class TestLatentImageOps(TestCase):
+    def test_combine_feather_at_origin(self):
+        latent_to = comfy.latent_image.LatentImage(torch.zeros((1, 4, 8, 8)))
+        latent_from = comfy.latent_image.LatentImage(torch.ones((1, 4, 8, 8)))
+        combined = comfy.latent_image.LatentImage.combine(latent_to, latent_from, 0, 0, 16)
+        self.assertTrue(torch.equal(combined._data, latent_from._data))
+
+    def test_combine_feather_edges(self):
+        latent_to = comfy.latent_image.LatentImage(torch.zeros((1, 4, 8, 8)))
+        latent_from = comfy.latent_image.LatentImage(torch.ones((1, 4, 8, 8)))
+        combined = comfy.latent_image.LatentImage.combine(latent_to, latent_from, 16, 16, 16)._data
+        self.assertTrue(torch.all(combined[:, :, :2, :] == 0))
+        self.assertTrue(torch.all(combined[:, :, :, :2] == 0))
+        self.assertTrue(torch.allclose(combined[:, :, 2, 2], torch.tensor(0.25)))
+        self.assertTrue(torch.allclose(combined[:, :, 2, 3:], torch.tensor(0.5)))
+        self.assertTrue(torch.allclose(combined[:, :, 3:, 2], torch.tensor(0.5)))
+        self.assertTrue(torch.all(combined[:, :, 3:, 3:] == 1))
+
+
 class TestSDV1(TestCase):
     @classmethod
     def setUpClass(cls):